@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+
+from .caching import get_auth_token_cache_key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        # A per-process cache would keep revoked tokens alive in other workers.
+        if isinstance(caches['default'], LocMemCache):
+            return super().authenticate_credentials(key)
+        cache_key = get_auth_token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return token.user, token
@@ -0,0 +1,282 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from hashlib import md5, sha256
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from recipes.models import Cart, Ingredient, IngredientAmount, User
+
+SHOPPING_CART_VERSION_KEY = 'shopping_cart_version:{}'
+SHOPPING_CART_KEY = 'shopping_cart:{}:{}'
+FAVORITES_VERSION_KEY = 'favorites_version:{}'
+SUBSCRIPTIONS_VERSION_KEY = 'subscriptions_version:{}'
+SUBSCRIBED_IDS_KEY = 'subscribed_ids:{}:{}'
+INGREDIENTS_VERSION_KEY = 'ingredients_version'
+AUTH_TOKEN_KEY = 'auth_token:{}'
+POPULAR_AUTHORS_KEY = 'feed_popular_authors'
+RESPONSE_GENERATION_KEY = 'response_generation:{}'
+RESPONSE_KEY = 'response:{}:{}:{}'
+RESPONSE_STATS_KEY = 'response_stats:{}:{}'
+RESPONSE_CACHE_GROUPS = ('recipes', 'tags', 'ingredients')
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(keys):
+    cache.set_many({key: uuid4().hex for key in keys}, timeout=None)
+
+
+def bump_response_generations(*groups):
+    bump_versions(RESPONSE_GENERATION_KEY.format(group) for group in groups)
+
+
+def get_response_generation(group):
+    return get_version(RESPONSE_GENERATION_KEY.format(group))
+
+
+def normalize_params(query_params, exclude=()):
+    return sorted(
+        (name, sorted(values))
+        for name, values in query_params.lists()
+        if name not in exclude
+    )
+
+
+def get_response_cache_key(group, request):
+    params = normalize_params(request.query_params)
+    generation = get_response_generation(group)
+    key = md5(f'{request.get_host()}|{request.path}|{params}'.encode())
+    return RESPONSE_KEY.format(group, generation, key.hexdigest())
+
+
+def count_response(group, outcome):
+    key = RESPONSE_STATS_KEY.format(group, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_response_stats():
+    keys = {
+        (group, outcome): RESPONSE_STATS_KEY.format(group, outcome)
+        for group in RESPONSE_CACHE_GROUPS
+        for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(keys.values())
+    stats = {group: {} for group in RESPONSE_CACHE_GROUPS}
+    for (group, outcome), key in keys.items():
+        stats[group][outcome] = values.get(key, 0)
+    return stats
+
+
+def get_user_versions(user):
+    if user.is_anonymous:
+        return ()
+    return tuple(
+        get_version(key.format(user.id))
+        for key in (
+            FAVORITES_VERSION_KEY,
+            SHOPPING_CART_VERSION_KEY,
+            SUBSCRIPTIONS_VERSION_KEY,
+        )
+    )
+
+
+def bump_favorites_versions(user_ids):
+    bump_versions(FAVORITES_VERSION_KEY.format(pk) for pk in user_ids)
+
+
+def bump_subscriptions_versions(user_ids):
+    bump_versions(SUBSCRIPTIONS_VERSION_KEY.format(pk) for pk in user_ids)
+
+
+def get_subscribed_ids(user):
+    if user.is_anonymous:
+        return frozenset()
+    version = get_version(SUBSCRIPTIONS_VERSION_KEY.format(user.id))
+    key = SUBSCRIBED_IDS_KEY.format(user.id, version)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(user.subscribe.values_list('id', flat=True))
+        cache.set(key, ids, settings.SUBSCRIBED_IDS_CACHE_TIMEOUT)
+    return ids
+
+
+def get_popular_author_ids():
+    ids = cache.get(POPULAR_AUTHORS_KEY)
+    if ids is None:
+        ids = frozenset(
+            User.subscribe.through.objects.values('to_user').annotate(
+                followers=Count('pk')
+            ).filter(
+                followers__gt=settings.FEED_FANOUT_LIMIT
+            ).values_list('to_user', flat=True)
+        )
+        cache.set(
+            POPULAR_AUTHORS_KEY, ids,
+            settings.FEED_POPULAR_AUTHORS_CACHE_TIMEOUT,
+        )
+    return ids
+
+
+def get_auth_token_cache_key(key):
+    return AUTH_TOKEN_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def invalidate_auth_tokens(keys):
+    cache.delete_many([get_auth_token_cache_key(key) for key in keys])
+
+
+def get_shopping_cart_version(user):
+    return get_version(SHOPPING_CART_VERSION_KEY.format(user.id))
+
+
+def bump_shopping_cart_versions(user_ids):
+    bump_versions(
+        SHOPPING_CART_VERSION_KEY.format(user_id) for user_id in user_ids
+    )
+
+
+pending_carts = threading.local()
+
+
+def schedule_shopping_cart_bumps(users=(), recipes=(), ingredients=()):
+    if not hasattr(pending_carts, 'users'):
+        pending_carts.users = set()
+        pending_carts.recipes = set()
+        pending_carts.ingredients = set()
+    pending_carts.users.update(users)
+    pending_carts.recipes.update(recipes)
+    pending_carts.ingredients.update(ingredients)
+    transaction.on_commit(flush_shopping_cart_bumps)
+
+
+def flush_shopping_cart_bumps():
+    if not hasattr(pending_carts, 'users'):
+        return
+    users = pending_carts.users
+    recipes = pending_carts.recipes
+    ingredients = pending_carts.ingredients
+    del pending_carts.users, pending_carts.recipes, pending_carts.ingredients
+    if recipes or ingredients:
+        users.update(Cart.objects.filter(
+            Q(recipe__in=recipes)
+            | Q(recipe__ingredients_in_recipe__ingredients__in=ingredients)
+        ).values_list('user_id', flat=True))
+    if users:
+        bump_shopping_cart_versions(users)
+
+
+def get_shopping_cart(user, version):
+    key = SHOPPING_CART_KEY.format(user.id, version)
+    ingredients = cache.get(key)
+    if ingredients is None:
+        ingredients = list(
+            IngredientAmount.objects
+            .filter(recipe__carts__user=user)
+            .values('ingredients__name', 'ingredients__measurement_unit')
+            .annotate(amount=Sum('amount'))
+            .order_by('ingredients__name', 'ingredients__measurement_unit')
+            .iterator(chunk_size=settings.SHOPPING_CART_CHUNK_SIZE)
+        )
+        cache.set(key, ingredients, settings.SHOPPING_CART_CACHE_TIMEOUT)
+    return ingredients
+
+
+class IngredientCatalogue:
+    def __init__(self, version, rows):
+        self.version = version
+        self.ids = array('q', (row[0] for row in rows))
+        self.names = tuple(row[1] for row in rows)
+        self.units = tuple(sys.intern(row[2]) for row in rows)
+        self.keys = tuple(name.casefold() for name in self.names)
+        self.positions = {pk: index for index, pk in enumerate(self.ids)}
+
+    def build(self, index):
+        return Ingredient(
+            id=self.ids[index],
+            name=self.names[index],
+            measurement_unit=self.units[index],
+        )
+
+
+class IngredientCache:
+    def __init__(self):
+        self.catalogue = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        version = get_version(INGREDIENTS_VERSION_KEY)
+        catalogue = self.catalogue
+        if catalogue is not None and catalogue.version == version:
+            return catalogue
+        with self.lock:
+            catalogue = self.catalogue
+            if catalogue is not None and catalogue.version == version:
+                return catalogue
+            rows = sorted(
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ),
+                key=lambda row: (row[1].casefold(), row[1], row[0]),
+            )
+            self.catalogue = catalogue = IngredientCatalogue(version, rows)
+            return catalogue
+
+    def invalidate(self):
+        self.catalogue = None
+        bump_versions((INGREDIENTS_VERSION_KEY,))
+
+    def all(self):
+        catalogue = self.load()
+        return [
+            catalogue.build(index) for index in range(len(catalogue.ids))
+        ]
+
+    def get(self, pk):
+        catalogue = self.load()
+        index = catalogue.positions.get(pk)
+        return None if index is None else catalogue.build(index)
+
+    def in_bulk(self, pks):
+        catalogue = self.load()
+        return {
+            pk: catalogue.build(catalogue.positions[pk])
+            for pk in pks if pk in catalogue.positions
+        }
+
+    def search(self, name, limit):
+        catalogue = self.load()
+        keys = catalogue.keys
+        name = name.casefold()
+        found = []
+        index = bisect_left(keys, name)
+        while (
+            len(found) < limit
+            and index < len(keys)
+            and keys[index].startswith(name)
+        ):
+            found.append(index)
+            index += 1
+        for index, key in enumerate(keys):
+            if len(found) >= limit:
+                break
+            if name in key and not key.startswith(name):
+                found.append(index)
+        return [catalogue.build(index) for index in found]
+
+
+ingredient_cache = IngredientCache()
@@ -0,0 +1,91 @@
+import base64
+import binascii
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from PIL import Image
+from recipes.images import UPLOAD_FORMATS, read_size, sniff_format
+from rest_framework import serializers
+
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+class DeferredBase64ImageField(serializers.Field):
+    default_error_messages = {
+        'invalid': 'Загрузите изображение в виде строки base64.',
+        'invalid_type': 'Неподдерживаемый тип изображения {content_type}.',
+        'invalid_image': 'Загруженный файл не является изображением.',
+        'too_large': 'Размер изображения превышает {max_size} МБ.',
+        'too_many_pixels': (
+            'Изображение слишком большое, допустимо '
+            'не более {max_pixels} пикселей.'
+        ),
+    }
+    content_types = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not data:
+            self.fail('invalid')
+        start = 0
+        if data.startswith('data:'):
+            content_type, separator, _ = data[5:].partition(';base64,')
+            if not separator:
+                self.fail('invalid')
+            if content_type not in self.content_types:
+                self.fail('invalid_type', content_type=content_type)
+            start = len(content_type) + len(separator) + 5
+        if (len(data) - start) * 3 // 4 > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.fail(
+                'too_large',
+                max_size=settings.IMAGE_UPLOAD_MAX_BYTES // 1024 // 1024,
+            )
+        file = SpooledTemporaryFile(max_size=settings.IMAGE_UPLOAD_SPOOL_SIZE)
+        try:
+            self.decode(data, start, file)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.seek(0)
+        return file
+
+    def decode(self, data, start, file):
+        size = None
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            try:
+                chunk = base64.b64decode(
+                    data[position:position + BASE64_CHUNK_SIZE], validate=True
+                )
+            except binascii.Error:
+                self.fail('invalid')
+            file.write(chunk)
+            if position == start:
+                if sniff_format(chunk) not in UPLOAD_FORMATS:
+                    self.fail('invalid_image')
+                size = self.read_size(file)
+                if size is not None:
+                    self.check_size(*size)
+        if size is None:
+            size = self.read_size(file)
+            if size is None:
+                self.fail('invalid_image')
+            self.check_size(*size)
+
+    def read_size(self, file):
+        try:
+            return read_size(file)
+        except Image.DecompressionBombError:
+            self.fail_too_many_pixels()
+
+    def check_size(self, width, height):
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail_too_many_pixels()
+
+    def fail_too_many_pixels(self):
+        self.fail('too_many_pixels', max_pixels=settings.IMAGE_MAX_PIXELS)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = value.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
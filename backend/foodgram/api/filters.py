@@ -1,13 +1,22 @@
+from django.conf import settings
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Recipe
 from rest_framework.filters import SearchFilter
 
 from recipes.models import Tag
 
+from .caching import ingredient_cache
+
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return ingredient_cache.all()
+        return ingredient_cache.search(name, settings.INGREDIENT_SEARCH_LIMIT)
+
 
 class RecipeFilters(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
@@ -15,8 +24,8 @@ class RecipeFilters(FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.order_by('-tags'),
     )
-    author = filters.AllValuesFilter(
-        method='filter_author'
+    author = filters.NumberFilter(
+        field_name='author'
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
@@ -24,15 +33,15 @@ class RecipeFilters(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
-
-    def filter_author(self, queryset, name, value):
-        if value:
-            return queryset.filter(author=value)
-        return queryset
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search'
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         if value:
@@ -43,3 +52,6 @@ class RecipeFilters(FilterSet):
         if value:
             return queryset.filter(carts__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
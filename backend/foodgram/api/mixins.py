@@ -0,0 +1,94 @@
+from hashlib import md5
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .caching import (count_response, get_response_cache_key,
+                      get_response_generation, get_user_versions,
+                      normalize_params)
+
+
+class AnonymousResponseCacheMixin:
+    cache_group = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = get_response_cache_key(self.cache_group, request)
+        data = cache.get(key)
+        if data is not None:
+            count_response(self.cache_group, 'hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        count_response(self.cache_group, 'misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class ConditionalGetMixin:
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, None, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            last_modified = self.queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup]}
+            ).values_list(self.last_modified_field, flat=True).first()
+        except ValueError:
+            last_modified = None
+        if last_modified is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            super().retrieve, last_modified, request, *args, **kwargs
+        )
+
+    def get_etag(self, request, last_modified):
+        if last_modified is None:
+            # Counters are updated in place without touching the generation,
+            # so list tags expire together with the anonymous response cache.
+            marker = int(time() // settings.RESPONSE_CACHE_TIMEOUT)
+        else:
+            marker = last_modified.isoformat()
+        state = (
+            marker,
+            get_response_generation(self.cache_group),
+            get_user_versions(request.user),
+            request.accepted_renderer.format,
+            normalize_params(request.query_params),
+        )
+        return f'"{md5(repr(state).encode()).hexdigest()}"'
+
+    def conditional_response(self, handler, last_modified, request, *args,
+                             **kwargs):
+        etag = self.get_etag(request, last_modified)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(
+                    last_modified.timestamp()
+                )
+        return response
@@ -1,6 +1,291 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from hashlib import md5
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .caching import normalize_params
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class CountPaginator(Paginator):
+    def __init__(self, object_list, per_page, get_count, **kwargs):
+        self.get_count = get_count
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        return self.get_count(self.object_list)
+
+
+class CachedCountPageNumberPagination(LimitPageNumberPagination):
+    shared_count_actions = ('list',)
+    user_dependent_params = ('is_favorited', 'is_in_shopping_cart')
+    count_is_exact = True
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountPaginator(object_list, per_page, self.get_count)
+
+    def get_count_cache_key(self):
+        params = normalize_params(
+            self.request.query_params,
+            exclude=(self.page_query_param, self.page_size_query_param),
+        )
+        user_dependent = (
+            getattr(self.view, 'action', None) not in self.shared_count_actions
+            or any(name in self.user_dependent_params for name, _ in params)
+        )
+        user = self.request.user.pk if user_dependent else None
+        key = f'{self.request.path}|{user}|{params}'
+        return 'page_count:' + md5(key.encode()).hexdigest()
+
+    @staticmethod
+    def get_estimated_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return None
+        return int(row[0])
+
+    def get_count(self, queryset):
+        count = self.get_estimated_count(queryset)
+        if count is not None:
+            self.count_is_exact = False
+            return count
+        key = self.get_count_cache_key()
+        count = cache.get(key)
+        if count is not None:
+            self.count_is_exact = False
+            return count
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        self.count_is_exact = True
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class LimitCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+        return self.ordering
+
+
+class KeysetCursorPagination(LimitCursorPagination):
+    has_next = False
+    has_previous = False
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def get_position(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if (
+                data['ordering'] != list(self.ordering)
+                or len(data['position']) != len(self.ordering)
+            ):
+                raise ValueError
+            position = [
+                queryset.model._meta.get_field(
+                    field.lstrip('-')
+                ).to_python(value)
+                for field, value in zip(self.ordering, data['position'])
+            ]
+            return position, bool(data['reverse'])
+        except (binascii.Error, UnicodeError, ValueError, KeyError,
+                TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def after(ordering, position):
+        conditions = []
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+            equal[name] = value
+        return reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.get_position(request, queryset)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def encode_position(self, instance, reverse):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            position.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        encoded = urlsafe_b64encode(json.dumps({
+            'ordering': self.ordering,
+            'position': position,
+            'reverse': reverse,
+        }).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_position(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_position(self.page[0], True)
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    ordering = ('-pub_date', '-id')
+
+
+class UserCursorPagination(KeysetCursorPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class OptionalCursorPagination(CachedCountPageNumberPagination):
+    cursor_pagination_class = None
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(OptionalCursorPagination):
+    cursor_pagination_class = RecipeCursorPagination
+
+
+class UserPagination(OptionalCursorPagination):
+    cursor_pagination_class = UserCursorPagination
+
+
+class FeedPagination(LimitCursorPagination):
+    next_position = None
+
+    def get_position(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                encoded.encode('ascii')
+            ).decode('ascii').rsplit('|', 1)
+            position = parse_datetime(pub_date), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def paginate_positions(self, positions, page_size, request):
+        self.base_url = request.build_absolute_uri()
+        if len(positions) > page_size:
+            positions = positions[:page_size]
+            self.next_position = positions[-1]
+        return [pk for _, pk in positions]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        pub_date, pk = self.next_position
+        encoded = urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    charset = 'utf-8'
+    separator = ''
+    footer = ''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+    def header(self, user):
+        return ''
+
+    def stream(self, user, ingredients):
+        yield self.header(user)
+        separator = ''
+        for ingredient in ingredients:
+            yield separator + self.row(
+                ingredient['ingredients__name'],
+                ingredient['ingredients__measurement_unit'],
+                ingredient['amount'],
+            )
+            separator = self.separator
+        yield self.footer
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def header(self, user):
+        return f'Список покупок для пользователя {user}.\n'
+
+    def row(self, name, measurement_unit, amount):
+        return f'{name} - {amount} {measurement_unit}\n'
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    @staticmethod
+    def line(*values):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+
+    def header(self, user):
+        return self.line('name', 'measurement_unit', 'amount')
+
+    def row(self, name, measurement_unit, amount):
+        return self.line(name, measurement_unit, amount)
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    separator = ','
+    footer = ']'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    def header(self, user):
+        return '['
+
+    def row(self, name, measurement_unit, amount):
+        return json.dumps(
+            {
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            },
+            ensure_ascii=False,
+            separators=(',', ':'),
+        )
@@ -1,13 +1,27 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from recipes.models import (Favorite, Ingredient,
                             IngredientAmount, Recipe, Tag)
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.tasks import schedule_recipe_image
+
+from .caching import (get_subscribed_ids, ingredient_cache,
+                      schedule_shopping_cart_bumps)
+from .fields import DeferredBase64ImageField
+
 User = get_user_model()
 
 
+def subscribed_ids(context):
+    request = context.get('request')
+    if not hasattr(request, 'subscribed_ids'):
+        request.subscribed_ids = get_subscribed_ids(request.user)
+    return request.subscribed_ids
+
+
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -27,15 +41,27 @@ class UserSerializer(serializers.ModelSerializer):
         user = self.context.get('request').user
         if user.is_anonymous or (user == obj):
             return False
-        return user.subscribe.filter(id=obj.id).exists()
+        return obj.id in subscribed_ids(self.context)
+
+
+def absolute_url(context, url):
+    request = context.get('request')
+    if request is None or url is None:
+        return url
+    return request.build_absolute_uri(url)
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = 'id', 'name', 'image', 'cooking_time'
         read_only_fields = '__all__',
 
+    def get_image(self, obj):
+        return absolute_url(self.context, obj.image_variant('thumbnail'))
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -75,10 +101,32 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
+class BulkPrimaryKeyRelatedField(serializers.ListField):
+    default_error_messages = {
+        'does_not_exist': (
+            'Недопустимые первичные ключи {pk_values} - '
+            'объекты не существуют.'
+        ),
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(child=serializers.IntegerField(), **kwargs)
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        objects = self.queryset.in_bulk(set(pks))
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [objects[pk] for pk in pks]
+
+    def to_representation(self, value):
+        return [obj.pk for obj in value.all()]
+
+
 class IngredientRecipeCreateSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.order_by('name')
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -95,6 +143,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -107,32 +156,61 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
+            'image_status',
             'text',
             'cooking_time',
+            'favorites_count',
+            'carts_count',
         )
         read_only_fields = (
             'is_favorite',
             'is_in_shopping_cart',
+            'image_status',
+            'favorites_count',
+            'carts_count',
         )
 
-    def status(self, objects):
+    def status(self, obj, annotation, objects):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         user = self.context.get('request').user.id
         return objects.filter(user=user).exists()
 
     def get_is_favorited(self, obj):
-        return self.status(obj.favorite)
+        return self.status(obj, 'is_favorited', obj.favorite)
 
     def get_is_in_shopping_cart(self, obj):
-        return self.status(obj.carts)
+        return self.status(obj, 'is_in_shopping_cart', obj.carts)
+
+    def get_image_variants(self, obj):
+        return {
+            size: {
+                image_format: absolute_url(
+                    self.context, obj.image_variant(size, image_format)
+                )
+                for image_format in formats
+            }
+            for size, formats in obj.image_variants.items()
+        }
+
+
+class PantryRecipeSerializer(RecipeSerializer):
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'matched_count',
+            'missing_count',
+        )
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.order_by('name'), many=True
-    )
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all())
     author = UserSerializer(read_only=True)
     ingredients = IngredientRecipeCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = DeferredBase64ImageField()
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -159,7 +237,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'ingredients': 'В рецепте нужны ингредиенты'}
             )
-        validated_ingredients_obj = []
+        validated_ingredients_obj = set()
         for ingredient_item in ingredients:
             ingr_obj = ingredient_item['id']
             if ingr_obj in validated_ingredients_obj:
@@ -173,7 +251,19 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                      f'ингредиента "{ingr_obj}". Допустимы только '
                       'целые цифровые значения больше 1')
                 )
-            validated_ingredients_obj.append(ingr_obj)
+            validated_ingredients_obj.add(ingr_obj)
+        return data
+
+    def validate_ingredients(self, data):
+        pks = {ingredient_item['id'] for ingredient_item in data}
+        ingredients = ingredient_cache.in_bulk(pks)
+        missing = sorted(pks - ingredients.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты {missing} не существуют'
+            )
+        for ingredient_item in data:
+            ingredient_item['id'] = ingredients[ingredient_item['id']]
         return data
 
     def validate_cooking_time(self, data):
@@ -199,29 +289,74 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         IngredientAmount.objects.bulk_create(ingredient_liist)
 
+    @transaction.atomic
     def create(self, validated_data):
         image = validated_data.pop('image')
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(
-            image=image, **validated_data
+            image_status=Recipe.IMAGE_PENDING, **validated_data
         )
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        transaction.on_commit(
+            lambda: schedule_recipe_image(recipe.pk, image)
+        )
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        existing = {
+            ingredient_amount.ingredients_id: ingredient_amount
+            for ingredient_amount in recipe.ingredients_in_recipe.all()
+        }
+        created, changed = [], []
+        for ingredient_data in ingredients:
+            ingredient = ingredient_data['id']
+            amount = ingredient_data['amount']
+            ingredient_amount = existing.pop(ingredient.pk, None)
+            if ingredient_amount is None:
+                created.append(IngredientAmount(
+                    ingredients=ingredient, amount=amount, recipe=recipe,
+                ))
+            elif ingredient_amount.amount != amount:
+                ingredient_amount.amount = amount
+                changed.append(ingredient_amount)
+        if existing:
+            IngredientAmount.objects.filter(
+                pk__in=[item.pk for item in existing.values()]
+            ).delete()
+        IngredientAmount.objects.bulk_update(changed, ('amount',))
+        IngredientAmount.objects.bulk_create(created)
+        return bool(existing or changed or created)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientAmount.objects.filter(recipe=instance).delete()
-        instance.tags.set(validated_data.pop('tags'))
-        ingredients = validated_data.pop('ingredients')
-        self.create_ingredients(instance, ingredients)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        ingredients = validated_data.pop('ingredients', None)
+        if (
+            ingredients is not None
+            and self.update_ingredients(instance, ingredients)
+        ):
+            schedule_shopping_cart_bumps(recipes=(instance.pk,))
+        image = validated_data.pop('image', None)
+        if image is not None:
+            instance.image_status = Recipe.IMAGE_PENDING
+            transaction.on_commit(
+                lambda: schedule_recipe_image(instance.pk, image)
+            )
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related(request.user).get(
+            pk=instance.pk
+        )
         return RecipeSerializer(
             instance,
-            context={'request': self.context.get('request')}
+            context={'request': request}
         ).data
 
 
@@ -242,20 +377,19 @@ class SubscribeSerializer(UserSerializer):
         read_only_fields = ('email', 'username', 'last_name', 'first_name',)
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            try:
-                recipes = recipes[:int(limit)]
-            except ValueError:
-                raise ValueError(
-                    'параметр limit не удалось преобразовать в число'
-                )
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            limit = self.context.get('recipes_limit')
+            if limit is not None:
+                recipes = recipes[:limit]
         serializer = ShortRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, Tag)
+from recipes.signals import recipe_image_processed
+from rest_framework.authtoken.models import Token
+
+from .caching import (bump_favorites_versions, bump_response_generations,
+                      bump_subscriptions_versions, ingredient_cache,
+                      invalidate_auth_tokens, schedule_shopping_cart_bumps)
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_cache(sender, **kwargs):
+    ingredient_cache.invalidate()
+    bump_response_generations('ingredients', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_responses(sender, **kwargs):
+    bump_response_generations('tags', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipe_image_processed, sender=Recipe)
+def invalidate_recipe_responses(sender, **kwargs):
+    bump_response_generations('recipes')
+
+
+@receiver((post_save, post_delete), sender=Cart)
+def invalidate_shopping_cart(sender, instance, **kwargs):
+    schedule_shopping_cart_bumps(users=(instance.user_id,))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def invalidate_recipe_shopping_carts(sender, instance, **kwargs):
+    schedule_shopping_cart_bumps(recipes=(instance.recipe_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_shopping_carts(sender, instance, created, **kwargs):
+    if not created:
+        schedule_shopping_cart_bumps(ingredients=(instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def invalidate_favorites(sender, instance, **kwargs):
+    bump_favorites_versions((instance.user_id,))
+
+
+@receiver(m2m_changed, sender=User.subscribe.through)
+def invalidate_subscriptions(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_subscriptions_versions((instance.pk,))
+    elif action == 'pre_clear':
+        bump_subscriptions_versions(
+            instance.subscribers.values_list('pk', flat=True)
+        )
+    else:
+        bump_subscriptions_versions(pk_set)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_auth_tokens((instance.key,))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields,
+                           **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    invalidate_auth_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, created, update_fields,
+                                **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    bump_response_generations('recipes')
@@ -0,0 +1,472 @@
+import base64
+import struct
+import zlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, Tag)
+from recipes.pantry import PANTRY_SEQUENCE_KEY, pantry_index
+from rest_framework.test import APITestCase
+
+from .caching import get_auth_token_cache_key
+
+User = get_user_model()
+
+
+class FoodgramTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password12345',
+            )
+            for number in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тэг {number}',
+                color=f'#00000{number}',
+                slug=f'tag{number}',
+            )
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def make_recipe(self, author, name, ingredients=None):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Текст', cooking_time=5
+        )
+        recipe.tags.set(self.tags)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=1)
+            for ingredient in (ingredients or self.ingredients[:3])
+        )
+        return recipe
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+
+class RecipeListQueriesTest(FoodgramTestCase):
+    def test_queries_do_not_grow_with_limit(self):
+        for number, name in enumerate(('Первый', 'Второй', 'Третий', 'Пятый')):
+            recipe = self.make_recipe(self.users[number % 2], name)
+            Favorite.objects.create(user=self.users[2], recipe=recipe)
+        self.client.force_authenticate(self.users[2])
+        queries = self.count_queries('/api/recipes/?limit=1')
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/recipes/?limit=4')
+        results = response.json()['results']
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(recipe['is_favorited'] for recipe in results))
+
+
+class SubscriptionsTest(FoodgramTestCase):
+    def test_empty_subscriptions_with_recipes_limit(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=3'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_zero_recipes_limit_means_no_recipes(self):
+        self.make_recipe(self.users[1], 'Первый')
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(
+            f'/api/users/{self.users[1].id}/subscribe/?recipes_limit=0'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['recipes'], [])
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=0'
+        )
+        self.assertEqual(response.json()['results'][0]['recipes'], [])
+        self.assertEqual(response.json()['results'][0]['recipes_count'], 1)
+
+
+class ShoppingCartVersionTest(FoodgramTestCase):
+    url = '/api/recipes/download_shopping_cart/?format=txt'
+
+    def download(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+
+    def test_etag_follows_cart_and_recipe_changes(self):
+        recipe = self.make_recipe(self.users[1], 'Первый')
+        self.client.force_authenticate(self.users[0])
+        etag = self.download()['ETag']
+        self.assertEqual(self.download(etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Ингредиент 0', b''.join(
+            response.streaming_content
+        ).decode())
+        etag = response['ETag']
+        self.client.force_authenticate(self.users[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/recipes/{recipe.id}/',
+                {
+                    'ingredients': [
+                        {'id': self.ingredients[5].id, 'amount': 2}
+                    ],
+                    'tags': [self.tags[0].id],
+                },
+                format='json',
+            )
+        self.client.force_authenticate(self.users[0])
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Ингредиент 5 - 2 г', b''.join(
+            response.streaming_content
+        ).decode())
+
+    def test_etag_follows_changes_outside_the_api(self):
+        recipe = self.make_recipe(self.users[1], 'Первый')
+        with self.captureOnCommitCallbacks(execute=True):
+            Cart.objects.create(user=self.users[0], recipe=recipe)
+        self.client.force_authenticate(self.users[0])
+        etag = self.download()['ETag']
+        ingredient = self.ingredients[0]
+        ingredient.name = 'Переименованный'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Переименованный', b''.join(
+            response.streaming_content
+        ).decode())
+
+
+def png_chunk(kind, data):
+    return (
+        struct.pack('>I', len(data)) + kind + data
+        + struct.pack('>I', zlib.crc32(kind + data))
+    )
+
+
+def png_header(width, height):
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + png_chunk(
+            b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        )
+        + png_chunk(b'IDAT', zlib.compress(b''))
+    )
+
+
+class ImageUploadTest(FoodgramTestCase):
+    def post_image(self, content):
+        self.client.force_authenticate(self.users[0])
+        return self.client.post(
+            '/api/recipes/',
+            {
+                'name': 'Картинка',
+                'text': 'Текст',
+                'cooking_time': 5,
+                'tags': [self.tags[0].id],
+                'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+                'image': (
+                    'data:image/png;base64,'
+                    + base64.b64encode(content).decode()
+                ),
+            },
+            format='json',
+        )
+
+    def test_decompression_bomb_header_is_rejected(self):
+        response = self.post_image(png_header(20000, 20000))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('пикселей', response.json()['image'][0])
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_corrupt_image_data_fails_the_recipe(self):
+        content = bytearray(png_header(2, 2))
+        content[-1] ^= 0xff
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post_image(bytes(content))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            Recipe.objects.get(pk=response.json()['id']).image_status,
+            Recipe.IMAGE_FAILED,
+        )
+
+
+class AnonymousResponseCacheTest(FoodgramTestCase):
+    def test_hits_until_generation_is_bumped(self):
+        recipe = self.make_recipe(self.users[0], 'Первый')
+        url = f'/api/recipes/{recipe.id}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        tag = self.tags[0]
+        tag.name = 'Новое имя'
+        tag.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn(
+            'Новое имя', [tag['name'] for tag in response.json()['tags']]
+        )
+        recipe.name = 'Переименованный'
+        recipe.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Переименованный')
+
+    def test_ingredients_follow_catalogue_changes(self):
+        url = '/api/ingredients/?name=Ингредиент'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        Ingredient.objects.create(name='Ингредиент 9', measurement_unit='г')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 7)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.force_authenticate(self.users[0])
+        self.assertNotIn('X-Cache', self.client.get('/api/tags/'))
+
+
+class ConditionalGetTest(FoodgramTestCase):
+    def test_list_revalidation_skips_the_database(self):
+        self.make_recipe(self.users[0], 'Первый')
+        etag = self.client.get('/api/recipes/')['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            [
+                query['sql'] for query in context
+                if settings.CACHES['default']['LOCATION'] not in query['sql']
+            ],
+            [],
+        )
+        self.assertNotIn('Last-Modified', response)
+
+    def test_related_changes_replace_etag(self):
+        recipe = self.make_recipe(self.users[0], 'Первый')
+        url = f'/api/recipes/{recipe.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        tag = self.tags[0]
+        tag.name = 'Новое имя'
+        tag.save()
+        response = self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_author_changes_replace_list_etag(self):
+        self.make_recipe(self.users[0], 'Первый')
+        etag = self.client.get('/api/recipes/')['ETag']
+        author = self.users[0]
+        author.first_name = 'Другое'
+        author.save()
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['author']['first_name'], 'Другое'
+        )
+
+
+class CachedTokenAuthenticationTest(FoodgramTestCase):
+    def login(self):
+        response = self.client.post(
+            '/api/auth/token/login/',
+            {'email': 'user0@example.com', 'password': 'password12345'},
+        )
+        token = response.json()['auth_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertIsNotNone(cache.get(get_auth_token_cache_key(token)))
+        return token
+
+    def test_logout_revokes_cached_token(self):
+        self.login()
+        self.assertEqual(
+            self.client.post('/api/auth/token/logout/').status_code, 204
+        )
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_password_change_drops_cached_token(self):
+        token = self.login()
+        response = self.client.post(
+            '/api/users/set_password/',
+            {
+                'current_password': 'password12345',
+                'new_password': 'another-password-678',
+            },
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(cache.get(get_auth_token_cache_key(token)))
+
+    def test_deactivation_revokes_cached_token(self):
+        self.login()
+        user = self.users[0]
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_per_process_cache_is_not_trusted(self):
+        response = self.client.post(
+            '/api/auth/token/login/',
+            {'email': 'user0@example.com', 'password': 'password12345'},
+        )
+        token = response.json()['auth_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertIsNone(cache.get(get_auth_token_cache_key(token)))
+
+
+@override_settings(FEED_FANOUT_LIMIT=1)
+class FeedTest(FoodgramTestCase):
+    def feed_names(self, user):
+        cache.clear()
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/recipes/feed/')
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_demoted_author_keeps_popular_recipes(self):
+        author, follower, other = self.users
+        follower.subscribe.add(author)
+        other.subscribe.add(author)
+        self.make_recipe(author, 'Популярный')
+        self.assertEqual(self.feed_names(follower), ['Популярный'])
+        other.subscribe.remove(author)
+        self.assertEqual(self.feed_names(follower), ['Популярный'])
+
+    def test_demotion_by_clearing_subscriptions(self):
+        author, follower, other = self.users
+        follower.subscribe.add(author)
+        other.subscribe.add(author)
+        self.make_recipe(author, 'Популярный')
+        other.subscribe.clear()
+        self.assertEqual(self.feed_names(follower), ['Популярный'])
+        self.assertEqual(self.feed_names(other), [])
+
+    def test_demotion_from_the_author_side(self):
+        author, follower, other = self.users
+        author.subscribers.add(follower, other)
+        self.make_recipe(author, 'Популярный')
+        author.subscribers.remove(other)
+        self.assertEqual(self.feed_names(follower), ['Популярный'])
+
+
+class PantryJournalTest(FoodgramTestCase):
+    def test_row_changes_reach_loaded_index(self):
+        recipe = self.make_recipe(self.users[0], 'Первый')
+        wanted = {ingredient.pk for ingredient in self.ingredients[:2]}
+        self.assertEqual(pantry_index.match(wanted, 0), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientAmount.objects.filter(
+                recipe=recipe, ingredients=self.ingredients[2]
+            ).get().delete()
+        self.assertEqual(pantry_index.match(wanted, 0), [(recipe.pk, 2, 0)])
+
+    def test_recipe_delete_writes_one_entry(self):
+        recipe = self.make_recipe(self.users[0], 'Первый')
+        wanted = {ingredient.pk for ingredient in self.ingredients[:3]}
+        self.assertEqual(pantry_index.match(wanted, 0), [(recipe.pk, 3, 0)])
+        sequence = cache.get(PANTRY_SEQUENCE_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertEqual(cache.get(PANTRY_SEQUENCE_KEY), sequence + 1)
+        self.assertEqual(pantry_index.match(wanted, 0), [])
+
+
+class RecipeCursorPaginationTest(FoodgramTestCase):
+    def walk(self, url, link='next'):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = [recipe['id'] for recipe in response.json()['results']]
+            ids.extend(page)
+            pages.append(page)
+            url = response.json()[link]
+        return ids, pages
+
+    def test_tied_ordering_visits_every_recipe_once(self):
+        recipes = [
+            self.make_recipe(self.users[0], f'Рецепт {number}')
+            for number in range(15)
+        ]
+        Favorite.objects.create(user=self.users[1], recipe=recipes[3])
+        ids, pages = self.walk(
+            '/api/recipes/?ordering=-favorites_count&limit=4&cursor='
+        )
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(set(ids), {recipe.id for recipe in recipes})
+        self.assertEqual(ids[0], recipes[3].id)
+        response = self.client.get(
+            '/api/recipes/?ordering=-favorites_count&limit=4&cursor='
+        )
+        last = self.client.get(response.json()['next'])
+        back = self.client.get(last.json()['previous']).json()
+        self.assertEqual(
+            [recipe['id'] for recipe in back['results']], pages[0]
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        for number in range(3):
+            self.make_recipe(self.users[0], f'Рецепт {number}')
+        response = self.client.get('/api/recipes/?limit=1&cursor=')
+        url = response.json()['next'].replace('?', '?ordering=carts_count&')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class RecipeAdminTest(FoodgramTestCase):
+    def test_changelist_without_image(self):
+        recipe = self.make_recipe(self.users[0], 'Без картинки')
+        recipe.image_status = Recipe.IMAGE_PENDING
+        recipe.save()
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password12345',
+        )
+        self.client.force_login(admin)
+        response = self.client.get('/admin/recipes/recipe/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'src=None')
+        self.assertContains(response, 'Обрабатывается')
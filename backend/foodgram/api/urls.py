@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (IngredientViewSet, RecipeViewSet, ResponseCacheStatsView,
+                    TagViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -14,6 +15,7 @@ router.register('recipes', RecipeViewSet, 'recipes')
 
 urlpatterns = (
     path('', include(router.urls)),
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='cache-stats'),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 )
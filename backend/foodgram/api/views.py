@@ -1,22 +1,38 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Prefetch, prefetch_related_objects
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from recipes.models import (Cart, Favorite, Ingredient,
-                            IngredientAmount, Recipe, Tag)
+from recipes.feed import fan_out, timeline
+from recipes.models import Cart, Favorite, Ingredient, Recipe, Tag
+from recipes.pantry import pantry_index
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED)
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from .caching import (get_popular_author_ids, get_response_stats,
+                      get_shopping_cart, get_shopping_cart_version,
+                      get_subscribed_ids, ingredient_cache)
 from .filters import IngredientFilter, RecipeFilters
-from .paginators import LimitPageNumberPagination
+from .mixins import AnonymousResponseCacheMixin, ConditionalGetMixin
+from .paginators import (FeedPagination, LimitPageNumberPagination,
+                         RecipePagination, UserPagination)
 from .permissions import IsAdminOrReadOnly, UserAndAdminOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
-                          RecipeSerializer, ShortRecipeSerializer,
+from .renderers import (ShoppingCartCSVRenderer, ShoppingCartJSONRenderer,
+                        ShoppingCartTextRenderer)
+from .serializers import (IngredientSerializer, PantryRecipeSerializer,
+                          RecipeCreateSerializer, RecipeSerializer,
+                          ShortRecipeSerializer,
                           SubscribeSerializer,
                           TagSerializer, UserSerializer)
 
@@ -27,9 +43,25 @@ User = get_user_model()
 class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.order_by('-date_joined')
     serializer_class = UserSerializer
-    pagination_class = LimitPageNumberPagination
+    pagination_class = UserPagination
     additional_serializer = SubscribeSerializer
 
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if not limit:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError(
+                {'recipes_limit': 'параметр не удалось преобразовать в число'}
+            )
+        if limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'параметр не может быть отрицательным'}
+            )
+        return limit
+
     @action(
         detail=True,
         methods=('POST', 'DELETE',),
@@ -41,7 +73,10 @@ class UserViewSet(DjoserUserViewSet):
             return Response(status=HTTP_401_UNAUTHORIZED)
         obj = get_object_or_404(self.queryset, id=kwargs.get('id'))
         serializer = self.additional_serializer(
-            obj, context={'request': self.request}
+            obj, context={
+                'request': self.request,
+                'recipes_limit': self.get_recipes_limit(),
+            }
         )
         if self.request.method == 'POST':
             user.subscribe.add(obj)
@@ -60,34 +95,60 @@ class UserViewSet(DjoserUserViewSet):
         user = self.request.user
         if user.is_anonymous:
             return Response(status=HTTP_401_UNAUTHORIZED)
-        authors = user.subscribe.all()
+        limit = self.get_recipes_limit()
+        authors = user.subscribe.annotate(
+            recipes_count=Count('recipes')
+        ).order_by('username')
         pages = self.paginate_queryset(authors)
+        prefetch_related_objects(pages, Prefetch(
+            'recipes',
+            queryset=Recipe.objects.first_per_author(pages, limit),
+            to_attr='limited_recipes',
+        ))
         serializer = SubscribeSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(AnonymousResponseCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.order_by('-name')
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    cache_group = 'tags'
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousResponseCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.order_by('name')
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    search_fields = ('name',)
     filter_backends = [IngredientFilter]
+    cache_group = 'ingredients'
+
+    def get_object(self):
+        try:
+            ingredient = ingredient_cache.get(int(self.kwargs['pk']))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise NotFound
+        return ingredient
 
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.select_related('author')
+class RecipeViewSet(
+    ConditionalGetMixin, AnonymousResponseCacheMixin, ModelViewSet
+):
+    queryset = Recipe.objects.all()
     serializer_class = RecipeCreateSerializer
     permission_classes = (UserAndAdminOrReadOnly,)
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipePagination
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
     filter_class = RecipeFilters
+    ordering_fields = ('pub_date', 'favorites_count', 'carts_count')
+    cache_group = 'recipes'
+
+    def get_queryset(self):
+        return self.queryset.with_related(self.request.user)
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH']:
@@ -100,7 +161,8 @@ class RecipeViewSet(ModelViewSet):
         return context
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        transaction.on_commit(lambda: fan_out(recipe))
 
     @staticmethod
     def add_to_list(model, user, pk):
@@ -142,21 +204,104 @@ class RecipeViewSet(ModelViewSet):
         methods=['GET'],
         permission_classes=(IsAuthenticated,),
     )
-    def download_shopping_cart(self, request):
-        ingredients = (
-            IngredientAmount.objects
-            .filter(recipe__carts__user=request.user)
-            .values('ingredients__name', 'ingredients__measurement_unit')
-            .annotate(amount=Sum('amount'))
+    def feed(self, request):
+        paginator = FeedPagination()
+        page_size = paginator.get_page_size(request)
+        positions = timeline(
+            request.user.id,
+            get_popular_author_ids() & get_subscribed_ids(request.user),
+            paginator.get_position(request),
+            page_size + 1,
+        )
+        ids = paginator.paginate_positions(positions, page_size, request)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = RecipeSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_pantry_params(self):
+        try:
+            ingredients = {
+                int(pk)
+                for value in self.request.query_params.getlist('ingredients')
+                for pk in value.split(',') if pk.strip()
+            }
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'ожидается список id ингредиентов'}
+            )
+        if not ingredients:
+            raise ValidationError(
+                {'ingredients': 'укажите хотя бы один ингредиент'}
+            )
+        try:
+            max_missing = int(self.request.query_params.get(
+                'max_missing', settings.PANTRY_MAX_MISSING
+            ))
+        except ValueError:
+            raise ValidationError(
+                {'max_missing': 'параметр не удалось преобразовать в число'}
+            )
+        if max_missing < 0:
+            raise ValidationError(
+                {'max_missing': 'параметр не может быть отрицательным'}
+            )
+        return ingredients, max_missing
+
+    @action(detail=False, methods=['GET'])
+    def pantry(self, request):
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(
+            pantry_index.match(*self.get_pantry_params()), request, self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
         )
-        shopping_cart = [f'Список покупок для пользователя {request.user}.\n']
-        for ingredient in ingredients:
-            shopping_cart.append(
-                f'{ingredient["ingredients__name"]} - '
-                f'{ingredient["amount"]} '
-                f'{ingredient["ingredients__measurement_unit"]}\n'
+        results = []
+        for recipe_id, matched, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.matched_count = matched
+                recipe.missing_count = missing
+                results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            ShoppingCartJSONRenderer,
+        ),
+    )
+    def download_shopping_cart(self, request):
+        renderer = request.accepted_renderer
+        version = get_shopping_cart_version(request.user)
+        etag = f'"{version}-{renderer.format}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(
+                renderer.stream(
+                    request.user, get_shopping_cart(request.user, version)
+                ),
+                content_type=f'{renderer.media_type}; charset=utf-8',
             )
-        file = f'{request.user}_shopping_cart.txt'
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+        file = f'{request.user}_shopping_cart.{renderer.format}'
         response['Content-Disposition'] = f'attachment; filename={file}'
+        response['ETag'] = etag
         return response
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_response_stats())
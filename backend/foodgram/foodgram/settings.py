@@ -75,6 +75,15 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+    }
+}
+
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -96,7 +105,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':
-    ['rest_framework.authentication.TokenAuthentication', ],
+    ['api.authentication.CachedTokenAuthentication', ],
 
     'DEFAULT_PERMISSION_CLASSES':
     ['rest_framework.permissions.IsAuthenticatedOrReadOnly', ],
@@ -148,3 +157,32 @@ HEX_MAX_CHARS = 7
 TAG_SLUG_MAX_CHARS = 32
 RECIPE_NAME_MAX_CHARS = 200
 MIN_COOKING_TIME_AMOUNT = 1
+SHOPPING_CART_CHUNK_SIZE = 500
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60
+INGREDIENT_SEARCH_LIMIT = 20
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+RESPONSE_CACHE_TIMEOUT = 60
+SUBSCRIBED_IDS_CACHE_TIMEOUT = 60 * 10
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+FEED_FANOUT_LIMIT = 1000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 50
+FEED_POPULAR_AUTHORS_CACHE_TIMEOUT = 60 * 5
+SEARCH_CONFIG = 'russian'
+PANTRY_MAX_MISSING = 2
+PANTRY_MAX_REPLAY = 1000
+PANTRY_JOURNAL_TIMEOUT = 60 * 60
+RECIPE_IMAGE_SIZES = {
+    'thumbnail': (160, 160),
+    'card': (600, 600),
+}
+RECIPE_IMAGE_QUALITY = 82
+RECIPE_IMAGE_DIR = 'recipes/images'
+RECIPE_IMAGE_VARIANTS_DIR = 'recipes/variants'
+IMAGE_PROCESSING_ASYNC = os.getenv('IMAGE_PROCESSING_ASYNC', 'True') == 'True'
+IMAGE_PROCESSING_WORKERS = 2
+IMAGE_PROCESSING_QUEUE_SIZE = 16
+IMAGE_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+IMAGE_UPLOAD_SPOOL_SIZE = 1024 * 1024
+IMAGE_MAX_PIXELS = 6000 * 6000
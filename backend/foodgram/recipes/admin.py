@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.utils.safestring import mark_safe
+from django.utils.html import format_html
 
 from .models import (Cart, Favorite, Ingredient,
                      IngredientAmount, Recipe, Tag)
@@ -47,12 +47,16 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientInline,)
 
     def get_image(self, obj):
-        return mark_safe(f'<img src={obj.image.url} width="80" hieght="30">')
+        url = obj.image_variant('thumbnail')
+        if url is None:
+            return obj.get_image_status_display()
+        return format_html('<img src="{}" width="80" height="30">', url)
     get_image.short_description = 'Изображение'
 
     def get_favorites(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
     get_favorites.short_description = 'В избранном'
+    get_favorites.admin_order_field = 'favorites_count'
 
 
 @admin.register(IngredientAmount)
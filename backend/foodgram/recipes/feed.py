@@ -0,0 +1,133 @@
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import FeedEntry, Recipe, User
+
+Subscription = User.subscribe.through
+
+
+def is_popular(author_id):
+    return Subscription.objects.filter(
+        to_user=author_id
+    ).count() > settings.FEED_FANOUT_LIMIT
+
+
+def add_entries(recipes, user_ids):
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in user_ids
+            for recipe_id, author_id, pub_date in recipes
+        ),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(recipe):
+    if is_popular(recipe.author_id):
+        return
+    followers = Subscription.objects.filter(
+        to_user=recipe.author_id
+    ).values_list('from_user', flat=True).iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+    )
+    recipes = ((recipe.pk, recipe.author_id, recipe.pub_date),)
+    while True:
+        batch = list(islice(followers, settings.FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        add_entries(recipes, batch)
+
+
+def add_recent(user_ids, author_id):
+    recipes = Recipe.objects.filter(author=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'author', 'pub_date')
+    add_entries(recipes[:settings.FEED_BACKFILL_SIZE], user_ids)
+
+
+def backfill(user_ids, author_ids):
+    for author_id in author_ids:
+        if not is_popular(author_id):
+            add_recent(user_ids, author_id)
+
+
+def demote(removed):
+    # Called before the subscriptions in ``removed`` are deleted: authors
+    # falling back under the fan-out limit stop being read from Recipe, so
+    # their remaining followers get the recipes that were never fanned out.
+    lost = dict(
+        removed.order_by().values('to_user').annotate(
+            count=Count('pk')
+        ).values_list('to_user', 'count')
+    )
+    followers = dict(
+        Subscription.objects.filter(to_user__in=lost).order_by().values(
+            'to_user'
+        ).annotate(count=Count('pk')).values_list('to_user', 'count')
+    )
+    for author_id, count in lost.items():
+        total = followers[author_id]
+        if total - count <= settings.FEED_FANOUT_LIMIT < total:
+            add_recent(
+                list(
+                    Subscription.objects.filter(to_user=author_id).exclude(
+                        from_user__in=removed.filter(
+                            to_user=author_id
+                        ).values('from_user')
+                    ).values_list('from_user', flat=True)
+                ),
+                author_id,
+            )
+
+
+def drop_authors(user_ids, author_ids=None):
+    entries = FeedEntry.objects.filter(user__in=user_ids)
+    if author_ids is not None:
+        entries = entries.filter(author__in=author_ids)
+    entries.delete()
+
+
+def before(position, date_field, id_field):
+    if position is None:
+        return Q()
+    pub_date, pk = position
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(
+        **{date_field: pub_date, f'{id_field}__lt': pk}
+    )
+
+
+def timeline(user_id, popular_author_ids, position, limit):
+    streams = [
+        FeedEntry.objects.filter(
+            before(position, 'pub_date', 'recipe'), user=user_id
+        ).order_by('-pub_date', '-recipe').values_list(
+            'pub_date', 'recipe'
+        )[:limit]
+    ]
+    if popular_author_ids:
+        streams.append(
+            Recipe.objects.filter(
+                before(position, 'pub_date', 'id'),
+                author__in=popular_author_ids,
+            ).order_by('-pub_date', '-id').values_list(
+                'pub_date', 'id'
+            )[:limit]
+        )
+    positions = []
+    for item in merge(*streams, reverse=True):
+        if positions and positions[-1] == item:
+            continue
+        positions.append(item)
+        if len(positions) == limit:
+            break
+    return positions
@@ -0,0 +1,95 @@
+import io
+from hashlib import sha256
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+FORMATS = (('jpeg', 'JPEG', 'jpg'), ('webp', 'WEBP', 'webp'))
+UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+def image_formats():
+    return [
+        image_format for image_format in FORMATS
+        if image_format[0] != 'webp' or features.check('webp')
+    ]
+
+
+def build_variants(field_file):
+    with field_file.open('rb') as file:
+        content = file.read()
+    digest = sha256(content).hexdigest()
+    with Image.open(io.BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    variants = {}
+    for size_name, size in settings.RECIPE_IMAGE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[size_name] = {}
+        for key, pillow_format, extension in image_formats():
+            name = (
+                f'{settings.RECIPE_IMAGE_VARIANTS_DIR}/{digest[:2]}/'
+                f'{digest}_{size_name}.{extension}'
+            )
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                resized.save(
+                    buffer,
+                    pillow_format,
+                    quality=settings.RECIPE_IMAGE_QUALITY,
+                    optimize=True,
+                )
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+            variants[size_name][key] = name
+    return digest, variants
+
+
+def sniff_format(header):
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'GIF'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def read_size(file):
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            return image.size
+    except (OSError, SyntaxError):
+        return None
+    finally:
+        file.seek(0, io.SEEK_END)
+
+
+def reencode_image(file):
+    file.seek(0)
+    with Image.open(file) as image:
+        image.verify()
+    file.seek(0)
+    with Image.open(file) as image:
+        image_format = image.format
+        if image_format not in UPLOAD_FORMATS:
+            raise ValueError(f'Неподдерживаемый формат {image_format}')
+        image.load()
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            image.convert('RGB').save(
+                buffer, 'JPEG', quality=settings.RECIPE_IMAGE_QUALITY
+            )
+        else:
+            image.save(buffer, image_format)
+    return ContentFile(
+        buffer.getvalue(),
+        name=f'{uuid4()}.{UPLOAD_FORMATS[image_format]}',
+    )
@@ -0,0 +1,11 @@
+import statistics
+import time
+
+
+def measure(repeat, query):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,97 @@
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from recipes.feed import add_entries, timeline
+from recipes.management.benchmark import measure
+from recipes.models import FeedEntry, Recipe, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок из таблицы FeedEntry с выборкой '
+        'рецептов по author__in. Данные откатываются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader = User.objects.create(
+                email='feed-reader@example.com', username='feed-reader'
+            )
+            authors = User.objects.bulk_create(
+                (
+                    User(
+                        email=f'feed-author-{number}@example.com',
+                        username=f'feed-author-{number}',
+                    )
+                    for number in range(options['authors'])
+                ),
+                batch_size=5000,
+            )
+            if connection.features.can_return_rows_from_bulk_insert:
+                author_ids = [author.pk for author in authors]
+            else:
+                author_ids = list(User.objects.filter(
+                    username__startswith='feed-author-'
+                ).values_list('pk', flat=True))
+            User.subscribe.through.objects.bulk_create(
+                (
+                    User.subscribe.through(
+                        from_user=reader, to_user_id=author_id
+                    )
+                    for author_id in author_ids
+                ),
+                batch_size=5000,
+            )
+            Recipe.objects.bulk_create(
+                (
+                    Recipe(
+                        author_id=author_id,
+                        name=f'Рецепт {number}',
+                        text='Текст',
+                        cooking_time=1,
+                    )
+                    for number in range(options['recipes'])
+                    for author_id in author_ids
+                ),
+                batch_size=5000,
+            )
+            add_entries(
+                Recipe.objects.filter(author__in=author_ids).values_list(
+                    'pk', 'author', 'pub_date'
+                ).iterator(),
+                (reader.pk,),
+            )
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE recipes_recipe')
+                    cursor.execute('ANALYZE recipes_feedentry')
+            self.stdout.write(
+                f'Записей в ленте: {FeedEntry.objects.count()}'
+            )
+            page_size = options['page_size']
+            naive = measure(
+                options['repeat'],
+                lambda: list(
+                    Recipe.objects.filter(
+                        author__in=reader.subscribe.all()
+                    ).order_by('-pub_date', '-id').values_list(
+                        'pub_date', 'id'
+                    )[:page_size + 1]
+                ),
+            )
+            feed = measure(
+                options['repeat'],
+                lambda: timeline(reader.pk, (), None, page_size + 1),
+            )
+            self.stdout.write(
+                f'Первая страница: author__in {naive:.2f} мс, '
+                f'лента {feed:.2f} мс'
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,71 @@
+import csv
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.caching import IngredientCache
+from recipes.management.benchmark import measure
+from recipes.models import Ingredient
+
+QUERIES = ('с', 'са', 'мол', 'соль', 'ябл', 'рис', 'ов', 'перец чер')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск ингредиентов по каталогу в памяти с запросом '
+        'icontains на увеличенном справочнике. Данные откатываются '
+        'после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(
+                settings.BASE_DIR, '..', '..', 'data', 'ingredients.csv'
+            ),
+        )
+        parser.add_argument('--scale', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as file:
+            rows = [row for row in csv.reader(file) if len(row) == 2]
+        with transaction.atomic():
+            for copy in range(options['scale']):
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(
+                            name=f'{name} {copy}', measurement_unit=unit
+                        )
+                        for name, unit in rows
+                    ),
+                    batch_size=5000,
+                )
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE recipes_ingredient')
+            self.stdout.write(
+                f'Ингредиентов в таблице: {Ingredient.objects.count()}'
+            )
+            queryset = Ingredient.objects.order_by('name')
+            catalogue = IngredientCache()
+            load = measure(1, catalogue.load)
+            self.stdout.write(f'Загрузка каталога: {load:.2f} мс')
+            for query in QUERIES:
+                autocomplete = measure(
+                    options['repeat'],
+                    lambda: catalogue.search(
+                        query, settings.INGREDIENT_SEARCH_LIMIT
+                    ),
+                )
+                icontains = measure(
+                    options['repeat'],
+                    lambda: list(queryset.filter(name__icontains=query)),
+                )
+                self.stdout.write(
+                    f'"{query}": каталог {autocomplete:.2f} мс, '
+                    f'icontains {icontains:.2f} мс'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,107 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+
+from recipes.management.benchmark import measure
+from recipes.models import Ingredient, IngredientAmount, Recipe, User
+from recipes.pantry import PantryIndex
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает подбор рецептов по имеющимся ингредиентам через '
+        'индекс в памяти с GROUP BY по recipes_ingredientamount. '
+        'Данные откатываются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--pantry', type=int, default=15)
+        parser.add_argument('--max-missing', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        generator = random.Random(0)
+        with transaction.atomic():
+            author = User.objects.create(
+                email='pantry-author@example.com', username='pantry-author'
+            )
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'Ингредиент {number}', measurement_unit='г'
+                    )
+                    for number in range(options['ingredients'])
+                ),
+                batch_size=5000,
+            )
+            ingredient_ids = list(Ingredient.objects.filter(
+                name__startswith='Ингредиент '
+            ).values_list('pk', flat=True))
+            Recipe.objects.bulk_create(
+                (
+                    Recipe(
+                        author=author,
+                        name=f'Рецепт {number}',
+                        text='Текст',
+                        cooking_time=1,
+                    )
+                    for number in range(options['recipes'])
+                ),
+                batch_size=5000,
+            )
+            IngredientAmount.objects.bulk_create(
+                (
+                    IngredientAmount(
+                        recipe_id=recipe_id,
+                        ingredients_id=ingredient_id,
+                        amount=1,
+                    )
+                    for recipe_id in Recipe.objects.filter(
+                        author=author
+                    ).values_list('pk', flat=True)
+                    for ingredient_id in generator.sample(
+                        ingredient_ids,
+                        generator.randint(1, options['per_recipe']),
+                    )
+                ),
+                batch_size=5000,
+            )
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE recipes_ingredientamount')
+            index = PantryIndex()
+            build = measure(1, index.rebuild)
+            self.stdout.write(f'Построение индекса: {build:.2f} мс')
+            pantry = generator.sample(ingredient_ids, options['pantry'])
+            max_missing = options['max_missing']
+            indexed = measure(
+                options['repeat'], lambda: index.rank(pantry, max_missing)
+            )
+            grouped = measure(
+                options['repeat'],
+                lambda: list(
+                    Recipe.objects.annotate(
+                        total=Count('ingredients_in_recipe'),
+                        matched=Count(
+                            'ingredients_in_recipe',
+                            filter=Q(
+                                ingredients_in_recipe__ingredients__in=pantry
+                            ),
+                        ),
+                    ).filter(
+                        matched__gt=0,
+                        total__lte=F('matched') + max_missing,
+                    ).order_by(
+                        F('total') - F('matched'), '-matched', '-id'
+                    ).values_list('pk', 'matched')
+                ),
+            )
+            self.stdout.write(
+                f'Подбор: индекс {indexed:.2f} мс, GROUP BY {grouped:.2f} мс'
+            )
+            transaction.set_rollback(True)
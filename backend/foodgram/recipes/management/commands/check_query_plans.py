@@ -0,0 +1,121 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Cart, Favorite, Recipe, Tag, User
+
+TABLES = (
+    'recipes_recipe',
+    'recipes_favorite',
+    'recipes_cart',
+    'recipes_recipe_tags',
+)
+SEQUENTIAL_SCAN = {
+    'postgresql': r'Seq Scan on (\w+)',
+    'sqlite': r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет через EXPLAIN, что список рецептов и фильтры по автору, '
+        'тэгам, избранному и списку покупок не читают таблицы целиком. '
+        'Данные откатываются после проверки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f'Проверка не поддерживается для {connection.vendor}'
+            )
+        with transaction.atomic():
+            reader, tag, author_id = self.seed(options)
+            page = slice(0, options['page_size'])
+            recipes = Recipe.objects.order_by('-pub_date', '-id')
+            plans = {
+                'список': recipes[page],
+                'автор': recipes.filter(author=author_id)[page],
+                'тэги': recipes.filter(tags__slug=tag.slug)[page],
+                'избранное': recipes.filter(favorite__user=reader)[page],
+                'покупки': recipes.filter(carts__user=reader)[page],
+            }
+            failed = []
+            for name, queryset in plans.items():
+                plan = queryset.explain()
+                scans = {
+                    table for table in re.findall(pattern, plan)
+                    if table in TABLES
+                }
+                self.stdout.write(f'{name}:\n{plan}\n')
+                if scans:
+                    failed.append(f'{name} ({", ".join(sorted(scans))})')
+            transaction.set_rollback(True)
+        if failed:
+            raise CommandError(
+                'Последовательное чтение таблиц: ' + '; '.join(failed)
+            )
+        self.stdout.write('Последовательных чтений не найдено')
+
+    def seed(self, options):
+        reader = User.objects.create(
+            email='plan-reader@example.com', username='plan-reader'
+        )
+        User.objects.bulk_create(
+            (
+                User(
+                    email=f'plan-author-{number}@example.com',
+                    username=f'plan-author-{number}',
+                )
+                for number in range(options['authors'])
+            ),
+            batch_size=5000,
+        )
+        author_ids = list(User.objects.filter(
+            username__startswith='plan-author-'
+        ).values_list('pk', flat=True))
+        tag = Tag.objects.create(
+            name='Проверка планов', color='#FEDCBA', slug='plan-check'
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=author_ids[number % len(author_ids)],
+                    name=f'Рецепт {number}',
+                    text='Текст',
+                    cooking_time=1,
+                )
+                for number in range(options['recipes'])
+            ),
+            batch_size=5000,
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            author__in=author_ids
+        ).values_list('pk', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag=tag)
+                for recipe_id in recipe_ids[::10]
+            ),
+            batch_size=5000,
+        )
+        users = [reader.pk, *author_ids]
+        for model in (Favorite, Cart):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for number, user_id in enumerate(users)
+                    for recipe_id in recipe_ids[number::len(users)][:20]
+                ),
+                batch_size=5000,
+            )
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f'ANALYZE {table}')
+        return reader, tag, author_ids[0]
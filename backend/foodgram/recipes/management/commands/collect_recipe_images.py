@@ -0,0 +1,66 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.storage import recipe_image_storage
+
+
+def walk(storage, directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield f'{directory}/{name}'
+    for name in directories:
+        yield from walk(storage, f'{directory}/{name}')
+
+
+def is_referenced(storage, name):
+    if storage is recipe_image_storage:
+        return Recipe.objects.filter(image=name).exists()
+    digest = os.path.basename(name).partition('_')[0]
+    return Recipe.objects.filter(image_hash=digest).exists()
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы изображений, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе указанного числа секунд',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        referenced = set()
+        recipes = Recipe.objects.values_list('image', 'image_variants')
+        for image, variants in recipes.iterator():
+            referenced.add(image)
+            for formats in variants.values():
+                referenced.update(formats.values())
+        deadline = time.time() - options['min_age']
+        removed = freed = 0
+        for storage, directory in (
+            (recipe_image_storage, settings.RECIPE_IMAGE_DIR),
+            (default_storage, settings.RECIPE_IMAGE_VARIANTS_DIR),
+        ):
+            for name in walk(storage, directory):
+                path = storage.path(name)
+                if name in referenced or os.path.getmtime(path) > deadline:
+                    continue
+                if is_referenced(storage, name):
+                    continue
+                freed += os.path.getsize(path)
+                removed += 1
+                if not options['dry_run']:
+                    storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}, освобождено {freed // 1024} КБ'
+        ))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Recipe
+from recipes.signals import recipe_image_processed
+
+
+class Command(BaseCommand):
+    help = (
+        'Помечает ошибкой изображения рецептов, которые слишком долго '
+        'ожидают обработки (например, после перезапуска воркера)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=30 * 60,
+            help='Считать зависшими задачи старше указанного числа секунд',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        stale = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PENDING,
+            updated_at__lt=(
+                timezone.now() - timedelta(seconds=options['max_age'])
+            ),
+        )
+        recipe_ids = list(stale.values_list('pk', flat=True))
+        if not options['dry_run']:
+            Recipe.objects.filter(
+                pk__in=recipe_ids, image_status=Recipe.IMAGE_PENDING
+            ).update(
+                image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now()
+            )
+            for recipe_id in recipe_ids:
+                recipe_image_processed.send(
+                    sender=Recipe, recipe_id=recipe_id
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Помечено зависших изображений: {len(recipe_ids)}'
+        ))
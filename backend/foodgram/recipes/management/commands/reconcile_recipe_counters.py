@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного и списков покупок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = (
+            Recipe.objects
+            .order_by()
+            .annotate(
+                actual_favorites=Count('favorite', distinct=True),
+                actual_carts=Count('carts', distinct=True),
+            )
+            .filter(
+                ~Q(favorites_count=F('actual_favorites'))
+                | ~Q(carts_count=F('actual_carts'))
+            )
+            .values_list('pk', 'actual_favorites', 'actual_carts')
+        )
+        batch = []
+        repaired = 0
+        for pk, favorites, carts in drifted.iterator():
+            batch.append(
+                Recipe(pk=pk, favorites_count=favorites, carts_count=carts)
+            )
+            if len(batch) >= options['batch_size']:
+                repaired += self.save(batch)
+                batch = []
+        repaired += self.save(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {repaired}'
+        ))
+
+    @staticmethod
+    def save(batch):
+        Recipe.objects.bulk_update(batch, ('favorites_count', 'carts_count'))
+        return len(batch)
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.18 on 2026-10-18 17:13
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='', verbose_name='Изображение блюда'),
+        ),
+    ]
@@ -1,11 +1,19 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models.functions import Length
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length, RowNumber
 
 from users.validators import NamesValidator
 
+from .images import build_variants
+from .storage import recipe_image_storage
+
 
 User = get_user_model()
 
@@ -79,7 +87,106 @@ class Tag(models.Model):
         ordering = ('name', )
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self, user):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredients_in_recipe',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredients'
+                ),
+            ),
+        ).with_user_flags(user)
+
+    def first_per_author(self, authors, limit=None):
+        recipes = self.filter(author__in=authors)
+        if limit is None:
+            return recipes
+        if not authors:
+            return self.none()
+        ranked = recipes.annotate(
+            row_number=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('author'),
+                order_by=(models.F('pub_date').desc(), models.F('id').desc()),
+            )
+        ).values('pk', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.row_number <= %s',
+            (*params, limit),
+        ))
+
+    def search(self, value):
+        if connections[self.db].vendor != 'postgresql':
+            return self.filter(
+                models.Q(name__icontains=value)
+                | models.Q(text__icontains=value)
+                | models.Q(
+                    ingredients_in_recipe__ingredients__name__icontains=value
+                )
+            ).distinct()
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return self.filter(search_vector=query).annotate(
+            rank=SearchRank(models.F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
+
+    def update_search_vector(self):
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        ingredient_names = IngredientAmount.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredients__name', ' ')
+        ).values('names')
+        return self.update(search_vector=(
+            SearchVector(
+                'name', weight='A', config=settings.SEARCH_CONFIG
+            )
+            + SearchVector(
+                models.Subquery(ingredient_names),
+                weight='B',
+                config=settings.SEARCH_CONFIG,
+            )
+            + SearchVector(
+                'text', weight='C', config=settings.SEARCH_CONFIG
+            )
+        ))
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(False, models.BooleanField()),
+                is_in_shopping_cart=models.Value(
+                    False, models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                Cart.objects.filter(user=user, recipe=models.OuterRef('pk'))
+            ),
+        )
+
+
 class Recipe(models.Model):
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_PENDING, 'Обрабатывается'),
+        (IMAGE_READY, 'Готово'),
+        (IMAGE_FAILED, 'Ошибка обработки'),
+    )
+
     author = models.ForeignKey(
         to=User,
         on_delete=models.CASCADE,
@@ -94,6 +201,8 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение блюда',
         upload_to='',
+        storage=recipe_image_storage,
+        blank=True,
     )
     name = models.CharField(
         max_length=settings.RECIPE_NAME_MAX_CHARS,
@@ -117,14 +226,83 @@ class Recipe(models.Model):
         auto_now_add=True,
         editable=False,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    image_hash = models.CharField(
+        verbose_name='Хэш изображения',
+        max_length=64,
+        blank=True,
+        editable=False,
+    )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    image_status = models.CharField(
+        verbose_name='Статус изображения',
+        max_length=16,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_READY,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.name}. Автор: {self.author.username}'
 
+    def save(self, *args, **kwargs):
+        new_image = bool(self.image) and not self.image._committed
+        super().save(*args, **kwargs)
+        if new_image:
+            self.update_image_variants()
+
+    def update_image_variants(self):
+        self.image_hash, self.image_variants = build_variants(self.image)
+        Recipe.objects.filter(pk=self.pk).update(
+            image_hash=self.image_hash,
+            image_variants=self.image_variants,
+        )
+
+    def image_variant(self, size, image_format='jpeg'):
+        name = self.image_variants.get(size, {}).get(image_format)
+        if name:
+            return default_storage.url(name)
+        return self.image.url if self.image else None
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date', )
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('name', 'author'),
@@ -193,6 +371,9 @@ class Favorite(models.Model):
         ordering = ('-id',)
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
+        indexes = [
+            models.Index(fields=('user', '-id'), name='favorite_user_id_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -221,9 +402,60 @@ class Cart(models.Model):
         ordering = ('-id',)
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+        indexes = [
+            models.Index(fields=('user', '-id'), name='cart_user_id_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
                 name='unique_shopping_cart'
             )
         ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta():
+        ordering = ('-pub_date', '-recipe')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
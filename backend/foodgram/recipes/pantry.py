@@ -0,0 +1,133 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import IngredientAmount
+
+PANTRY_EPOCH_KEY = 'pantry_epoch'
+PANTRY_SEQUENCE_KEY = 'pantry_sequence'
+PANTRY_CHANGE_KEY = 'pantry_change:{}:{}'
+
+
+class PantryIndex:
+    def __init__(self):
+        self.epoch = None
+        self.sequence = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_epoch():
+        cache.add(PANTRY_EPOCH_KEY, uuid4().hex, timeout=None)
+        return cache.get(PANTRY_EPOCH_KEY)
+
+    @staticmethod
+    def get_sequence():
+        cache.add(PANTRY_SEQUENCE_KEY, 0, timeout=None)
+        return cache.get(PANTRY_SEQUENCE_KEY, 0)
+
+    def load(self):
+        epoch = self.get_epoch()
+        sequence = self.get_sequence()
+        if (epoch, sequence) == (self.epoch, self.sequence):
+            return
+        with self.lock:
+            if (epoch, sequence) == (self.epoch, self.sequence):
+                return
+            if not self.replay(epoch, sequence):
+                self.rebuild()
+            self.epoch, self.sequence = epoch, sequence
+
+    def replay(self, epoch, sequence):
+        if (
+            epoch != self.epoch
+            or self.sequence is None
+            or not 0 < sequence - self.sequence <= settings.PANTRY_MAX_REPLAY
+        ):
+            return False
+        keys = [
+            PANTRY_CHANGE_KEY.format(epoch, number)
+            for number in range(self.sequence + 1, sequence + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        self.refresh(set().union(*changes.values()))
+        return True
+
+    def rebuild(self):
+        postings = {}
+        recipes = {}
+        rows = IngredientAmount.objects.order_by(
+            'ingredients_id', 'recipe_id'
+        ).values_list('ingredients', 'recipe').iterator(chunk_size=10000)
+        for ingredient_id, recipe_id in rows:
+            posting = postings.get(ingredient_id)
+            if posting is None:
+                posting = postings[ingredient_id] = array('q')
+            elif posting[-1] == recipe_id:
+                continue
+            posting.append(recipe_id)
+            recipes.setdefault(recipe_id, array('q')).append(ingredient_id)
+        self.postings = postings
+        self.recipes = recipes
+
+    def refresh(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.recipes.pop(recipe_id, ()):
+                posting = self.postings[ingredient_id]
+                del posting[bisect_left(posting, recipe_id)]
+        rows = IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by().values_list('ingredients', 'recipe').distinct()
+        for ingredient_id, recipe_id in rows:
+            insort(
+                self.postings.setdefault(ingredient_id, array('q')),
+                recipe_id,
+            )
+            self.recipes.setdefault(recipe_id, array('q')).append(
+                ingredient_id
+            )
+
+    def record_changes(self, recipe_ids):
+        epoch = self.get_epoch()
+        self.get_sequence()
+        # incr() is not atomic on every shared backend; add() refuses a slot
+        # another process has already taken.
+        while not cache.add(
+            PANTRY_CHANGE_KEY.format(epoch, cache.incr(PANTRY_SEQUENCE_KEY)),
+            frozenset(recipe_ids),
+            settings.PANTRY_JOURNAL_TIMEOUT,
+        ):
+            pass
+
+    def invalidate(self):
+        self.epoch = None
+        cache.set(PANTRY_EPOCH_KEY, uuid4().hex, timeout=None)
+
+    def rank(self, ingredient_ids, max_missing):
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(self.postings.get(ingredient_id, ()))
+        ranked = []
+        for recipe_id, count in matched.items():
+            total = len(self.recipes[recipe_id])
+            if total - count <= max_missing:
+                ranked.append((total - count, -count, -recipe_id))
+        ranked.sort()
+        return [
+            (-recipe_id, -count, missing)
+            for missing, count, recipe_id in ranked
+        ]
+
+    def match(self, ingredient_ids, max_missing):
+        self.load()
+        with self.lock:
+            return self.rank(ingredient_ids, max_missing)
+
+
+pantry_index = PantryIndex()
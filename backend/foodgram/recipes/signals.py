@@ -0,0 +1,110 @@
+import threading
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .feed import backfill, demote, drop_authors
+from .models import (Cart, Favorite, FeedEntry, Ingredient, IngredientAmount,
+                     Recipe, User)
+from .pantry import pantry_index
+
+recipe_image_processed = Signal()
+changed_recipes = threading.local()
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    Cart: 'carts_count',
+}
+
+
+def change_counter(sender, instance, delta):
+    field = COUNTERS[sender]
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=Now(), **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+def decrement_counter(sender, instance, **kwargs):
+    change_counter(sender, instance, -1)
+
+
+@receiver(m2m_changed, sender=User.subscribe.through)
+def sync_feed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_remove':
+        if reverse:
+            demote(sender.objects.filter(
+                to_user=instance.pk, from_user__in=pk_set
+            ))
+        else:
+            demote(sender.objects.filter(
+                from_user=instance.pk, to_user__in=pk_set
+            ))
+    elif action == 'post_add':
+        if reverse:
+            backfill(pk_set, (instance.pk,))
+        else:
+            backfill((instance.pk,), pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            drop_authors(pk_set, (instance.pk,))
+        else:
+            drop_authors((instance.pk,), pk_set)
+    elif action == 'pre_clear':
+        if reverse:
+            FeedEntry.objects.filter(author=instance).delete()
+        else:
+            demote(sender.objects.filter(from_user=instance.pk))
+            drop_authors((instance.pk,))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            ingredients_in_recipe__ingredients=instance
+        ).update_search_vector()
+
+
+def schedule_recipe_refresh(recipe_ids):
+    # Row-level signals fire once per ingredient; collect them so a commit
+    # refreshes each recipe once and writes a single journal entry.
+    if not hasattr(changed_recipes, 'ids'):
+        changed_recipes.ids = set()
+    changed_recipes.ids.update(recipe_ids)
+    transaction.on_commit(refresh_changed_recipes)
+
+
+def refresh_changed_recipes():
+    recipe_ids = getattr(changed_recipes, 'ids', None)
+    if not recipe_ids:
+        return
+    changed_recipes.ids = set()
+    Recipe.objects.filter(pk__in=recipe_ids).update_search_vector()
+    pantry_index.record_changes(recipe_ids)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def refresh_recipe(sender, instance, **kwargs):
+    schedule_recipe_refresh((instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def refresh_recipe_ingredients(sender, instance, **kwargs):
+    schedule_recipe_refresh((instance.recipe_id,))
+
+
+@receiver(post_delete, sender=Ingredient)
+def invalidate_pantry_index(sender, **kwargs):
+    transaction.on_commit(pantry_index.invalidate)
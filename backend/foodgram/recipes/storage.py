@@ -0,0 +1,35 @@
+import os
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def content_name(self, name, content):
+        digest = sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return (
+            f'{settings.RECIPE_IMAGE_DIR}/{digest[:2]}/{digest[2:4]}/'
+            f'{digest}{extension}'
+        )
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .images import build_variants, reencode_image
+from .models import Recipe
+from .signals import recipe_image_processed
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PROCESSING_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+slots = threading.BoundedSemaphore(settings.IMAGE_PROCESSING_QUEUE_SIZE)
+
+
+def process_recipe_image(recipe_id, file):
+    recipes = Recipe.objects.filter(pk=recipe_id)
+    try:
+        recipe = recipes.get()
+        image = reencode_image(file)
+        recipe.image.save(image.name, image, save=False)
+        image_hash, image_variants = build_variants(recipe.image)
+        recipes.update(
+            image=recipe.image.name,
+            image_hash=image_hash,
+            image_variants=image_variants,
+            image_status=Recipe.IMAGE_READY,
+            updated_at=timezone.now(),
+        )
+    except Recipe.DoesNotExist:
+        pass
+    except Exception:
+        recipes.update(
+            image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now()
+        )
+    finally:
+        file.close()
+    recipe_image_processed.send(sender=Recipe, recipe_id=recipe_id)
+
+
+def process_in_worker(recipe_id, file):
+    try:
+        process_recipe_image(recipe_id, file)
+    finally:
+        connection.close()
+        slots.release()
+
+
+def schedule_recipe_image(recipe_id, file):
+    if not settings.IMAGE_PROCESSING_ASYNC or not slots.acquire(False):
+        process_recipe_image(recipe_id, file)
+        return
+    executor.submit(process_in_worker, recipe_id, file)